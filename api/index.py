@@ -1,26 +1,181 @@
 import os
 import json
+import functools
+import gzip
 import hashlib
+import heapq
 import re
+import threading
+import time
 import urllib.parse
-from typing import List, Dict, Any
-from http.server import BaseHTTPRequestHandler
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, deque
+from typing import List, Dict, Any, Optional, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import orjson  # Faster JSON encoding for API responses when available
+except ImportError:
+    orjson = None
+
+try:
+    # EPUB reading and text extraction, imported once - without them the sample remedies are served
+    import ebooklib
+    from ebooklib import epub
+    import lxml.html  # C parser for pulling the text out of EPUB documents
+    EPUB_IMPORT_ERROR = None
+except ImportError as e:
+    ebooklib = epub = lxml = None
+    EPUB_IMPORT_ERROR = e
 
 # Global storage for pre-loaded EPUB data
 books_data = []  # Store all text chunks with metadata
+# Books that yielded text, counted before cross-book dedup - test-book.epub duplicates 2.epub, so none of its
+# chunks survive in books_data, but it is still a loaded book
+loaded_book_names: List[str] = []
+
+# Column-wise (struct-of-arrays) copies of the per-chunk fields the scorer reads, rebuilt by index_books_data();
+# the numeric columns are packed byte arrays rather than lists of int objects
+chunk_texts_lower: List[str] = []
+chunk_book_priority = array("b")  # 1 = Barbara O'Neill book, -1 = test book, 0 = anything else
+chunk_keyword_bonus = array("B")  # Remedy-content bonus rank_chunks() adds to any chunk that scores
+
+# Bumped whenever books_data is replaced, so caches keyed on it never serve results from older data
+books_version = 0
+
+# Inverted index over chunk_texts_lower: alphanumeric token -> ids of the chunks containing it,
+# packed as unsigned ints (4 bytes per id instead of a pointer to a boxed int)
+token_postings: Dict[str, array] = {}
+
+# Set once the background load started at import has finished (see load_books_in_background)
+books_loaded = threading.Event()
+
+# Serialized /api/search responses: (query, k, books_version) -> (expiry on time.monotonic(), body).
+# Entries expire so remedies whose instructions/ingredients came from OpenAI are regenerated now and then.
+SEARCH_CACHE_TTL = 60  # seconds
+SEARCH_CACHE_SIZE = 256
+search_cache: Dict[Tuple[str, Any, int], Tuple[float, bytes]] = {}
+search_cache_lock = threading.Lock()
 
 # Configuration
 AFFILIATE_TAG = os.environ.get("AMZ_TAG", "YOURTAG-20")
 
+# Worker threads for OpenAI round trips that can overlap (network-bound, so the GIL is released)
+AI_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ai")
+# Whole-chunk extractions run concurrently per search; kept apart from AI_EXECUTOR, which extractions submit to
+EXTRACT_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="extract")
+
+# Static home page, read once at import instead of rebuilt on every request
+HOME_PAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "index.html")
+with open(HOME_PAGE_PATH, "rb") as f:
+    HOME_PAGE_BYTES = f.read()
+HOME_PAGE_GZIP = gzip.compress(HOME_PAGE_BYTES, 9)
+HOME_PAGE_ETAG = '"' + hashlib.blake2b(HOME_PAGE_BYTES, digest_size=16).hexdigest() + '"'
+
 # Regex patterns for ingredient extraction
 AMOUNT_RE = r"(?:\d+(?:\.\d+)?|\d+/\d+)"
 UNIT_RE = r"(?:tsp|tbsp|teaspoon|tablespoon|cup|cups|ml|l|g|kg|ounce|oz|inches|slice|slices|piece|pieces|drops?|pinch|handful)"
 BULLET_RE = re.compile(r"^\s*(?:[-•*]|\d+\.)\s+")
 ING_LINE = re.compile(rf"^\s*(?:{AMOUNT_RE}\s*(?:{UNIT_RE})?\s+)?([A-Za-z][\w\s\-']+)", re.IGNORECASE)
+AMOUNT_PAT = re.compile(AMOUNT_RE)
+UNIT_PAT = re.compile(UNIT_RE, re.IGNORECASE)
+# Substrings that make a bulleted line read as an ingredient outside an "Ingredients" section
+BULLET_UNIT_HINTS = ("tsp", "tbsp", "cup", "ml", "g", "oz")
+
+# Remedy-chunk detection over lowercased chunk text ("ingredient" also covers "ingredients")
+REMEDY_INGREDIENT_RE = re.compile(r"ingredient")
+REMEDY_VERB_RE = re.compile(r"remedy|treatment|recipe|for |cure|heal")
+
+# Ingredients that are tools rather than groceries - linked to Amazon's Health & Personal Care index
+HPC_TOOL_RE = re.compile(r"mortar|pestle|gauze|bandage|thermometer", re.IGNORECASE)
+
+# Text nodes a reader would see - what BeautifulSoup's get_text() returns, without building a soup per document
+VISIBLE_TEXT_XPATH = "//text()[not(ancestor::script or ancestor::style or ancestor::template)]"
+
+# Keywords rank_chunks() rewards - fixed, so whether a chunk contains any of them is worked out once at load
+RANK_REMEDY_KEYWORDS = ["remedy", "treatment", "cure", "heal", "recipe", "medicine", "therapeutic", 
+                        "natural", "herbal", "traditional", "preparation", "formula", "mixture"]
+RANK_INGREDIENT_KEYWORDS = ["ingredient", "ingredients", "herb", "herbs", "plant", "plants", 
+                            "root", "leaf", "flower", "extract", "oil", "tea", "tincture"]
+
+# Content find_remedies() skips unless it's clearly about the query - children's health and generic detox/wellness
+PEDIATRIC_KEYWORDS = ["children", "kids", "baby", "infant", "toddler", "pediatric"]
+GENERIC_KEYWORDS = ["detox", "cleansing", "general health", "overall wellness"]
+
+# Tokens of the inverted index - any query word made only of these characters occurs inside a single token
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Built-in remedies served when no EPUB chunks could be loaded
+SAMPLE_DATA = [
+    {"book": "Sample Book 1", "chapter": "Digestive Issues", "pos": 0, "text": "Ginger remedy for nausea and morning sickness. Ingredients: 1 tsp fresh ginger root, 1 cup hot water, honey to taste. Instructions: Peel and slice fresh ginger. Steep in hot water for 10 minutes. Add honey and drink warm. Effective for motion sickness and pregnancy nausea."},
+    
+    {"book": "Sample Book 1", "chapter": "Respiratory Health", "pos": 0, "text": "Honey and lemon for sore throat and cough. Ingredients: 2 tbsp raw honey, 1 fresh lemon juiced, 1 cup warm water, pinch of salt. Instructions: Mix honey and lemon juice in warm water. Add salt and stir. Sip slowly throughout the day. Soothes throat irritation."},
+    
+    {"book": "Sample Book 1", "chapter": "Pain Management", "pos": 0, "text": "Turmeric paste for joint pain and inflammation. Ingredients: 2 tsp turmeric powder, coconut oil to make paste, black pepper pinch. Instructions: Mix turmeric with enough coconut oil to form thick paste. Add black pepper. Apply to affected area and cover with cloth. Leave for 30 minutes."},
+    
+    {"book": "Sample Book 2", "chapter": "Sleep Disorders", "pos": 0, "text": "Chamomile tea for insomnia and anxiety. Ingredients: 1 tbsp dried chamomile flowers, 1 cup boiling water, honey optional. Instructions: Pour boiling water over chamomile flowers. Steep covered for 15 minutes. Strain and add honey if desired. Drink 30 minutes before bedtime."},
+    
+    {"book": "Sample Book 2", "chapter": "Digestive Health", "pos": 0, "text": "Apple cider vinegar for heartburn and acid reflux. Ingredients: 1 tbsp raw apple cider vinegar with mother, 1 cup warm water, honey to taste. Instructions: Mix apple cider vinegar in warm water. Add honey to improve taste. Drink 30 minutes before meals to prevent heartburn."},
+    
+    {"book": "Sample Book 2", "chapter": "Skin Conditions", "pos": 0, "text": "Aloe vera gel for burns and skin irritation. Ingredients: Fresh aloe vera leaf, vitamin E oil optional. Instructions: Cut aloe leaf and extract clear gel. Apply directly to affected skin. For enhanced healing, mix with a few drops of vitamin E oil. Reapply 2-3 times daily."},
+    
+    {"book": "Sample Book 1", "chapter": "Headaches", "pos": 0, "text": "Peppermint oil for headache relief. Ingredients: 2-3 drops pure peppermint essential oil, 1 tsp carrier oil like coconut oil. Instructions: Dilute peppermint oil with carrier oil. Massage gently onto temples and forehead. Avoid eye area. Also inhale directly for sinus headaches."},
+    
+    {"book": "Sample Book 2", "chapter": "Cold and Flu", "pos": 0, "text": "Elderberry syrup for immune support. Ingredients: 1 cup dried elderberries, 3 cups water, 1 cup raw honey, 1 tsp ginger powder, cinnamon stick. Instructions: Simmer elderberries in water for 15 minutes. Strain and add honey while warm. Add spices. Take 1 tbsp daily during cold season."},
+    
+    {"book": "Sample Book 1", "chapter": "Circulation", "pos": 0, "text": "Cayenne pepper for poor circulation. Ingredients: 1/4 tsp cayenne pepper powder, 1 cup warm water, lemon juice optional. Instructions: Mix cayenne pepper in warm water. Add lemon juice to taste. Drink slowly. Start with smaller amount and increase gradually. Improves blood flow."},
+    
+    {"book": "Sample Book 2", "chapter": "Detox", "pos": 0, "text": "Dandelion root tea for liver detox. Ingredients: 1 tsp dried dandelion root, 1 cup boiling water, lemon slice. Instructions: Pour boiling water over dandelion root. Steep for 10 minutes. Strain and add lemon slice. Drink twice daily to support liver function and detoxification."}
+]
+
+def html_to_text(content: bytes) -> str:
+    """Visible text of an (X)HTML document with whitespace collapsed - script/style bodies and comments are dropped"""
+    root = lxml.html.fromstring(content)
+    return " ".join(" ".join(root.xpath(VISIBLE_TEXT_XPATH)).split())
+
+def process_document(epub_file: str, document_number: int, item) -> List[Dict]:
+    """Chunk the text of one EPUB document item - independent of every other document, so it can run on a worker thread"""
+    try:
+        # Extract text from HTML content
+        content = item.get_content()
+        if not content:
+            return []
+        text = html_to_text(content)  # Text only, whitespace cleaned
+        
+        if len(text) <= 50:  # Lower threshold to capture more content
+            return []
+        print(f"Processing document {document_number}: {text[:100]}...")
+        chapter = getattr(item, "file_name", item.get_name())
+        # Split into chunks
+        return [
+            {
+                "book": epub_file,
+                "chapter": chapter,
+                "pos": pos,
+                "text": chunk
+            }
+            for pos, chunk in enumerate(chunk_words(text, 900, 150))
+        ]
+    except Exception as doc_error:
+        print(f"Error processing document in {epub_file}: {doc_error}")
+        return []
+
+def iter_epub_chunks(epub_file: str, book):
+    """Yield the text chunks of one read EPUB book in document order, parsing its documents on a pool of threads"""
+    print(f"Processing {epub_file}...")
+    # Only document items carry text - images, CSS and fonts are never touched
+    documents = list(book.get_items_of_type(ebooklib.ITEM_DOCUMENT))
+    # lxml releases the GIL while parsing, so documents parse in parallel; threads rather than processes
+    # because serverless runtimes have no /dev/shm for multiprocessing and the items aren't picklable
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="epub") as pool:
+        for document_chunks in pool.map(functools.partial(process_document, epub_file),
+                                        range(1, len(documents) + 1), documents):
+            yield from document_chunks
 
 def load_epub_books():
     """Load and process the pre-existing EPUB books"""
-    global books_data
+    global books_data, loaded_book_names
     
     if books_data:  # Already loaded
         return
@@ -34,10 +189,9 @@ def load_epub_books():
         print(f"Error listing files: {e}")
     
     try:
-        # Try to import EPUB processing libraries with specific error handling
-        import ebooklib
-        from ebooklib import epub
-        from bs4 import BeautifulSoup
+        # EPUB processing libraries are imported at module load - report why if they weren't available
+        if EPUB_IMPORT_ERROR is not None:
+            raise ImportError(EPUB_IMPORT_ERROR)
         print("EPUB libraries imported successfully")
         print(f"ebooklib version: {getattr(ebooklib, '__version__', 'unknown')}")
         
@@ -51,48 +205,37 @@ def load_epub_books():
         print(f"Total EPUB files found: {len(epub_files)}")
         
         chunks = []
-        for epub_file in epub_files:
+        book_names = []
+        seen_chunks = set()  # blake2b digests of chunk texts already loaded
+        duplicate_count = 0
+        # Reading a book (unzipping and parsing its manifest) doesn't depend on the others, so all of them are read
+        # concurrently; their chunks are still consumed in file order, which keeps dedup and chunk order unchanged
+        book_reader = ThreadPoolExecutor(max_workers=max(len(epub_files), 1), thread_name_prefix="epub-read")
+        books_read = [book_reader.submit(epub.read_epub, epub_file) for epub_file in epub_files]
+        book_reader.shutdown(wait=False)
+        for epub_file, book_read in zip(epub_files, books_read):
             try:
-                print(f"Processing {epub_file}...")
-                book = epub.read_epub(epub_file)
-                items = list(book.get_items())
-                print(f"Found {len(items)} items in {epub_file}")
-
-                document_count = 0
-                for item in items:
-                    if item.get_type() == ebooklib.ITEM_DOCUMENT:
-                        document_count += 1
-                        try:
-                            # Extract text from HTML content
-                            content = item.get_content()
-                            if content:
-                                soup = BeautifulSoup(content, "lxml" if "lxml" in str(content) else "html.parser")
-                                text = soup.get_text(" ", strip=True)
-                                text = " ".join(text.split())  # Clean whitespace
-                                
-                                if len(text) > 50:  # Lower threshold to capture more content
-                                    print(f"Processing document {document_count}: {text[:100]}...")
-                                    # Split into chunks
-                                    text_chunks = chunk_words(text, 900, 150)
-                                    for pos, chunk in enumerate(text_chunks):
-                                        chunks.append({
-                                            "book": epub_file,
-                                            "chapter": getattr(item, "file_name", item.get_name()),
-                                            "pos": pos,
-                                            "text": chunk
-                                        })
-                        except Exception as doc_error:
-                            print(f"Error processing document in {epub_file}: {doc_error}")
-                            continue
+                book_chunk_count = 0
+                for chunk in iter_epub_chunks(epub_file, book_read.result()):
+                    if not book_names or book_names[-1] != epub_file:
+                        book_names.append(epub_file)
+                    # Skip verbatim repeats (TOC, copyright pages) so they aren't scored on every search
+                    digest = hashlib.blake2b(chunk["text"].encode(), digest_size=16).digest()
+                    if digest in seen_chunks:
+                        duplicate_count += 1
+                        continue
+                    seen_chunks.add(digest)
+                    chunks.append(chunk)
+                    book_chunk_count += 1
                                     
-                print(f"Extracted {len([c for c in chunks if c['book'] == epub_file])} chunks from {epub_file}")
+                print(f"Extracted {book_chunk_count} chunks from {epub_file}")
                                     
             except Exception as e:
                 print(f"Error processing {epub_file}: {e}")
                 continue
         
         books_data = chunks
-        print(f"Total chunks loaded: {len(books_data)}")
+        print(f"Total chunks loaded: {len(books_data)} ({duplicate_count} duplicate chunks skipped)")
         
     except ImportError as e:
         print(f"EPUB libraries not available: {e}")
@@ -101,55 +244,40 @@ def load_epub_books():
     # Always ensure we have some data - use sample data if no EPUB chunks were loaded
     if not chunks:
         print("Loading fallback sample data - EPUB processing failed!")
-        books_data = [
-            {"book": "Sample Book 1", "chapter": "Digestive Issues", "pos": 0, "text": "Ginger remedy for nausea and morning sickness. Ingredients: 1 tsp fresh ginger root, 1 cup hot water, honey to taste. Instructions: Peel and slice fresh ginger. Steep in hot water for 10 minutes. Add honey and drink warm. Effective for motion sickness and pregnancy nausea."},
-            
-            {"book": "Sample Book 1", "chapter": "Respiratory Health", "pos": 0, "text": "Honey and lemon for sore throat and cough. Ingredients: 2 tbsp raw honey, 1 fresh lemon juiced, 1 cup warm water, pinch of salt. Instructions: Mix honey and lemon juice in warm water. Add salt and stir. Sip slowly throughout the day. Soothes throat irritation."},
-            
-            {"book": "Sample Book 1", "chapter": "Pain Management", "pos": 0, "text": "Turmeric paste for joint pain and inflammation. Ingredients: 2 tsp turmeric powder, coconut oil to make paste, black pepper pinch. Instructions: Mix turmeric with enough coconut oil to form thick paste. Add black pepper. Apply to affected area and cover with cloth. Leave for 30 minutes."},
-            
-            {"book": "Sample Book 2", "chapter": "Sleep Disorders", "pos": 0, "text": "Chamomile tea for insomnia and anxiety. Ingredients: 1 tbsp dried chamomile flowers, 1 cup boiling water, honey optional. Instructions: Pour boiling water over chamomile flowers. Steep covered for 15 minutes. Strain and add honey if desired. Drink 30 minutes before bedtime."},
-            
-            {"book": "Sample Book 2", "chapter": "Digestive Health", "pos": 0, "text": "Apple cider vinegar for heartburn and acid reflux. Ingredients: 1 tbsp raw apple cider vinegar with mother, 1 cup warm water, honey to taste. Instructions: Mix apple cider vinegar in warm water. Add honey to improve taste. Drink 30 minutes before meals to prevent heartburn."},
-            
-            {"book": "Sample Book 2", "chapter": "Skin Conditions", "pos": 0, "text": "Aloe vera gel for burns and skin irritation. Ingredients: Fresh aloe vera leaf, vitamin E oil optional. Instructions: Cut aloe leaf and extract clear gel. Apply directly to affected skin. For enhanced healing, mix with a few drops of vitamin E oil. Reapply 2-3 times daily."},
-            
-            {"book": "Sample Book 1", "chapter": "Headaches", "pos": 0, "text": "Peppermint oil for headache relief. Ingredients: 2-3 drops pure peppermint essential oil, 1 tsp carrier oil like coconut oil. Instructions: Dilute peppermint oil with carrier oil. Massage gently onto temples and forehead. Avoid eye area. Also inhale directly for sinus headaches."},
-            
-            {"book": "Sample Book 2", "chapter": "Cold and Flu", "pos": 0, "text": "Elderberry syrup for immune support. Ingredients: 1 cup dried elderberries, 3 cups water, 1 cup raw honey, 1 tsp ginger powder, cinnamon stick. Instructions: Simmer elderberries in water for 15 minutes. Strain and add honey while warm. Add spices. Take 1 tbsp daily during cold season."},
-            
-            {"book": "Sample Book 1", "chapter": "Circulation", "pos": 0, "text": "Cayenne pepper for poor circulation. Ingredients: 1/4 tsp cayenne pepper powder, 1 cup warm water, lemon juice optional. Instructions: Mix cayenne pepper in warm water. Add lemon juice to taste. Drink slowly. Start with smaller amount and increase gradually. Improves blood flow."},
-            
-            {"book": "Sample Book 2", "chapter": "Detox", "pos": 0, "text": "Dandelion root tea for liver detox. Ingredients: 1 tsp dried dandelion root, 1 cup boiling water, lemon slice. Instructions: Pour boiling water over dandelion root. Steep for 10 minutes. Strain and add lemon slice. Drink twice daily to support liver function and detoxification."}
-        ]
+        books_data = [dict(chunk) for chunk in SAMPLE_DATA]  # Copies - indexing adds derived fields to each chunk
+        loaded_book_names = list(dict.fromkeys(chunk["book"] for chunk in books_data))
     else:
         books_data = chunks
+        loaded_book_names = book_names
     
     print(f"Final: Loaded {len(books_data)} text chunks from books")
+    index_books_data()
+
+# Numbered section titles about a condition, e.g. "43. Liver Cancer" - chunk_words() starts a chunk at each one
+SECTION_TITLE_RE = re.compile(r'(\d+\.\s+[A-Z][^.]*(?:cancer|disease|condition|remedy)[^.]*)', re.IGNORECASE)
 
 def chunk_words(text: str, max_words=1200, overlap=200) -> List[str]:
     """Split text into overlapping chunks with better remedy detection"""
     
     # First try to split by sections/chapters if they exist
-    if re.search(r'\d+\.\s+[A-Z][^.]*(?:cancer|disease|condition|remedy)', text, re.IGNORECASE):
-        # Split by numbered sections (like "43. Liver Cancer")
-        sections = re.split(r'(\d+\.\s+[A-Z][^.]*(?:cancer|disease|condition|remedy)[^.]*)', text, flags=re.IGNORECASE)
+    # Split by numbered sections (like "43. Liver Cancer") - a single title match leaves more than one piece
+    sections = SECTION_TITLE_RE.split(text)
+    if len(sections) > 1:
         chunks = []
         
         for i in range(1, len(sections), 2):  # Every other item starting from 1
             if i + 1 < len(sections):
                 section_title = sections[i].strip()
                 section_content = sections[i + 1].strip()
-                full_section = f"{section_title} {section_content}"
+                content_words = section_content.split()  # Split once - counted here, sliced below if too long
                 
                 # If section is too long, split it but keep title
-                if len(full_section.split()) > max_words:
-                    content_words = section_content.split()
+                if len(section_title.split()) + len(content_words) > max_words:
                     for j in range(0, len(content_words), max_words - 50):
                         chunk_content = " ".join(content_words[j:j + max_words - 50])
                         chunks.append(f"{section_title} {chunk_content}")
                 else:
-                    chunks.append(full_section)
+                    chunks.append(f"{section_title} {section_content}")
         
         if chunks:
             print(f"📚 Split into {len(chunks)} section-based chunks")
@@ -174,7 +302,7 @@ def extract_ingredients_and_steps(snippet: str) -> Dict[str, Any]:
     print(f"\n=== EXTRACTION DEBUG START ===")
     print(f"Snippet length: {len(snippet)}")
     print(f"Snippet preview: {snippet[:200]}...")
-    lines = [l.strip() for l in snippet.splitlines() if l.strip()]
+    lines = [ln for l in snippet.splitlines() if (ln := l.strip())]  # Non-blank lines, each stripped once
     ingredients, steps = [], []
 
     mode = None
@@ -187,13 +315,15 @@ def extract_ingredients_and_steps(snippet: str) -> Dict[str, Any]:
             mode = "step"
             continue
 
+        bulleted = BULLET_RE.search(ln) is not None
+        
         # Check for ingredient-like lines
-        if mode == "ing" or (BULLET_RE.search(ln) and any(unit in low for unit in ["tsp", "tbsp", "cup", "ml", "g", "oz"])):
+        if mode == "ing" or (bulleted and any(unit in low for unit in BULLET_UNIT_HINTS)):
             m = ING_LINE.match(ln)
             if m:
                 name = m.group(1).strip()
-                amt_m = re.search(AMOUNT_RE, ln)
-                unit_m = re.search(UNIT_RE, ln, re.IGNORECASE)
+                amt_m = AMOUNT_PAT.search(ln)
+                unit_m = UNIT_PAT.search(ln)
                 ingredients.append({
                     "name": name,
                     "amount": amt_m.group(0) if amt_m else None,
@@ -203,13 +333,16 @@ def extract_ingredients_and_steps(snippet: str) -> Dict[str, Any]:
                 continue
 
         # Check for step-like lines
-        if BULLET_RE.search(ln) or mode == "step":
-            steps.append(re.sub(BULLET_RE, "", ln))
+        if bulleted or mode == "step":
+            steps.append(BULLET_RE.sub("", ln))
 
     print(f"\nBasic parser found {len(ingredients)} ingredients:")
     for i, ing in enumerate(ingredients):
         print(f"  {i+1}. {ing.get('name', 'NO NAME')}: {ing}")
     
+    # Instruction formatting is an independent OpenAI call - start it while ingredients are extracted
+    formatting = AI_EXECUTOR.submit(format_medical_text, snippet) if snippet else None
+    
     # Always try AI extraction for better ingredients if available
     if snippet:
         print(f"\nCalling AI extraction...")
@@ -225,8 +358,8 @@ def extract_ingredients_and_steps(snippet: str) -> Dict[str, Any]:
             print(f"AI returned empty list, keeping basic ingredients")
 
     # Always try AI formatting for better instructions if available
-    if snippet:
-        formatted_instructions = format_medical_text(snippet)
+    if formatting is not None:
+        formatted_instructions = formatting.result()
         if formatted_instructions and len(formatted_instructions) > 1:  # If AI formatted well, use it
             steps = formatted_instructions
         elif not steps:  # Otherwise use basic formatting as fallback
@@ -542,48 +675,47 @@ def manual_format_medical_text(text: str) -> List[str]:
     return sections[:6]
 
 
+# Variant names grouped under one canonical ingredient for deduplication
+HERB_VARIANTS = {
+    "ginger": ["ginger", "ginger root", "fresh ginger"],
+    "lemon": ["lemon", "lemon juice", "fresh lemon", "lemon juiced"],
+    "honey": ["honey", "raw honey", "organic honey"],
+    "water": ["water", "hot water", "warm water", "boiling water"],
+    "tea": ["tea", "herbal tea", "green tea"],
+    "oil": ["oil", "coconut oil", "olive oil", "essential oil"],
+    "turmeric": ["turmeric", "turmeric powder", "fresh turmeric"],
+    "garlic": ["garlic", "fresh garlic", "garlic cloves"],
+    "rhodiola": ["rhodiola", "rhodiola root"],
+    "ginseng": ["ginseng", "american ginseng", "korean ginseng"],
+    "ashwagandha": ["ashwagandha", "ashwagandha root"],
+    "devil's claw": ["devil's claw", "devils claw"],
+    "nettle": ["nettle", "stinging nettle", "nettle leaf"],
+    "coconut water": ["coconut water", "coconut milk"],
+    "hibiscus": ["hibiscus", "hibiscus flower", "hibiscus tea"]
+}
+
+# Reverse mapping for quick lookup
+HERB_LOOKUP = {variant.lower(): main_name for main_name, variants in HERB_VARIANTS.items() for variant in variants}
+
+# Words the basic parser can pick up as ingredient names that aren't ingredients
+NON_INGREDIENT_NAMES = frozenset(["teaspoon", "tablespoon", "cup", "boiling", "fresh", "organic", "raw"])
+
 def smart_dedupe_ingredients(ingredients: List[Dict]) -> List[Dict]:
     """Smart deduplication and consolidation of ingredients"""
     if not ingredients:
         return []
     
-    # Group similar ingredients
-    ingredient_groups = {}
-    common_herbs = {
-        "ginger": ["ginger", "ginger root", "fresh ginger"],
-        "lemon": ["lemon", "lemon juice", "fresh lemon", "lemon juiced"],
-        "honey": ["honey", "raw honey", "organic honey"],
-        "water": ["water", "hot water", "warm water", "boiling water"],
-        "tea": ["tea", "herbal tea", "green tea"],
-        "oil": ["oil", "coconut oil", "olive oil", "essential oil"],
-        "turmeric": ["turmeric", "turmeric powder", "fresh turmeric"],
-        "garlic": ["garlic", "fresh garlic", "garlic cloves"],
-        "rhodiola": ["rhodiola", "rhodiola root"],
-        "ginseng": ["ginseng", "american ginseng", "korean ginseng"],
-        "ashwagandha": ["ashwagandha", "ashwagandha root"],
-        "devil's claw": ["devil's claw", "devils claw"],
-        "nettle": ["nettle", "stinging nettle", "nettle leaf"],
-        "coconut water": ["coconut water", "coconut milk"],
-        "hibiscus": ["hibiscus", "hibiscus flower", "hibiscus tea"]
-    }
-    
-    # Reverse mapping for quick lookup
-    herb_lookup = {}
-    for main_name, variants in common_herbs.items():
-        for variant in variants:
-            herb_lookup[variant.lower()] = main_name
-    
     consolidated = {}
     
     for ing in ingredients:
         name_lower = ing["name"].lower().strip()
         
         # Skip non-ingredients
-        if name_lower in ["teaspoon", "tablespoon", "cup", "boiling", "fresh", "organic", "raw"]:
+        if name_lower in NON_INGREDIENT_NAMES:
             continue
             
         # Find the main ingredient name
-        main_name = herb_lookup.get(name_lower, name_lower)
+        main_name = HERB_LOOKUP.get(name_lower, name_lower)
         
         # If we already have this ingredient, choose the best version
         if main_name in consolidated:
@@ -597,22 +729,102 @@ def smart_dedupe_ingredients(ingredients: List[Dict]) -> List[Dict]:
     
     return list(consolidated.values())
 
+def load_books_in_background():
+    """Load the EPUB books, then release requests waiting in ensure_books_loaded()"""
+    try:
+        load_epub_books()
+    finally:
+        books_loaded.set()
+
+def ensure_books_loaded():
+    """Block until the EPUB books have been loaded"""
+    books_loaded.wait()
+
+def book_priority(book: str) -> int:
+    """Ranking priority of a source book: Barbara O'Neill books first, test content last"""
+    book_name = book.lower()
+    if any(priority_book in book_name for priority_book in ["1.epub", "2.epub"]):
+        return 1
+    if "test-book" in book_name:
+        return -1
+    return 0
+
+def index_books_data():
+    """Rebuild the scorer's column views of books_data and drop rankings cached for the old data"""
+    global chunk_texts_lower, chunk_book_priority, chunk_keyword_bonus, token_postings, books_version
+    chunk_texts_lower = []
+    for chunk in books_data:
+        # Per-chunk facts find_remedies() would otherwise recompute for every query
+        text_lower = chunk["text"].lower()
+        chunk["text_lower"] = text_lower
+        chunk["has_ingredient"] = bool(REMEDY_INGREDIENT_RE.search(text_lower))
+        chunk["has_remedy_kw"] = bool(REMEDY_VERB_RE.search(text_lower))
+        chunk["has_pediatric_kw"] = any(kw in text_lower for kw in PEDIATRIC_KEYWORDS)
+        chunk["has_generic_kw"] = any(kw in text_lower for kw in GENERIC_KEYWORDS)
+        # A strict remedy is titled by the chunk's first sentence, so its title and id are fixed per chunk
+        first_sentence = chunk["text"].split(".", 1)[0].strip()
+        if len(first_sentence) > 100:
+            first_sentence = first_sentence[:100] + "..."
+        chunk["remedy_title"] = first_sentence
+        chunk["remedy_id"] = remedy_id_for(chunk["text"], first_sentence) if first_sentence else None
+        chunk_texts_lower.append(text_lower)
+    chunk_book_priority = array("b", (book_priority(chunk.get("book", "")) for chunk in books_data))
+    chunk_keyword_bonus = array("B", (
+        (3 if any(kw in text_lower for kw in RANK_INGREDIENT_KEYWORDS) else 0) +
+        (5 if any(kw in text_lower for kw in RANK_REMEDY_KEYWORDS) else 0)
+        for text_lower in chunk_texts_lower
+    ))
+    
+    postings = {}
+    for idx, text_lower in enumerate(chunk_texts_lower):
+        for token in set(TOKEN_RE.findall(text_lower)):
+            postings.setdefault(token, array("I")).append(idx)
+    token_postings = postings
+    
+    books_version += 1
+    chunks_containing.cache_clear()
+    rank_chunks.cache_clear()
+
+@functools.lru_cache(maxsize=4096)
+def chunks_containing(word: str) -> frozenset:
+    """Ids of chunks whose lowercased text contains `word` (a single token) anywhere, looked up via the token index.
+    Cached per word - the vocabulary scan runs once for each word across all the queries that use it"""
+    ids = set()
+    for token, chunk_ids in token_postings.items():
+        if word in token:
+            ids.update(chunk_ids)
+    return frozenset(ids)
+
+def candidate_chunk_ids(query_words: set) -> Optional[List[int]]:
+    """Ids of the chunks that can score for a query - those containing at least 80% of its words.
+    Returns None when the index can't answer exactly (punctuation or non-ASCII in the query) and every chunk must be scored."""
+    if not query_words or not all(TOKEN_RE.fullmatch(word) for word in query_words):
+        return None
+    hits = Counter()
+    for word in query_words:
+        hits.update(chunks_containing(word))
+    return sorted(idx for idx, count in hits.items() if count / len(query_words) >= 0.8)
+
 def simple_text_search(query: str, max_results: int = 5) -> List[Dict]:
     """Precise search focused on exact query matching"""
-    original_query = query.lower().strip()
+    return [books_data[idx] for idx in rank_chunks(query.lower().strip(), max_results)]
+
+@functools.lru_cache(maxsize=4096)
+def rank_chunks(original_query: str, max_results: int) -> Tuple[int, ...]:
+    """Score every chunk against a normalized query and return the top chunk indices (cached per query)"""
     query_words = set(original_query.split())
     results = []
     
     print(f"🔍 Precise search for: '{original_query}' (words: {query_words})")
     
-    # Extended remedy keywords for better matching
-    remedy_keywords = ["remedy", "treatment", "cure", "heal", "recipe", "medicine", "therapeutic", 
-                      "natural", "herbal", "traditional", "preparation", "formula", "mixture"]
-    ingredient_keywords = ["ingredient", "ingredients", "herb", "herbs", "plant", "plants", 
-                          "root", "leaf", "flower", "extract", "oil", "tea", "tincture"]
+    # A chunk needs most query words to score at all (an exact phrase match contains them all),
+    # so only chunks the token index says contain them are scored
+    candidates = candidate_chunk_ids(query_words)
+    if candidates is None:
+        candidates = range(len(chunk_texts_lower))
     
-    for chunk in books_data:
-        text_lower = chunk["text"].lower()
+    for idx in candidates:
+        text_lower = chunk_texts_lower[idx]
         score = 0
         
         # Split text into sentences for analysis
@@ -635,7 +847,7 @@ def simple_text_search(query: str, max_results: int = 5) -> List[Dict]:
                         print(f"✅ Found specific sentence about '{original_query}': {sentence[:150]}...")
                         
                         # Extra bonus if this sentence also mentions remedies/treatments
-                        if any(kw in sentence for kw in remedy_keywords):
+                        if any(kw in sentence for kw in RANK_REMEDY_KEYWORDS):
                             score += 30
                     else:
                         # This is likely a generic list - lower score
@@ -667,783 +879,293 @@ def simple_text_search(query: str, max_results: int = 5) -> List[Dict]:
         
         # Bonus for remedy content only if we have some base score
         if score > 0:
-            if any(kw in text_lower for kw in ingredient_keywords):
-                score += 3
-            if any(kw in text_lower for kw in remedy_keywords):
-                score += 5
+            score += chunk_keyword_bonus[idx]  # +3 ingredient keywords, +5 remedy keywords
             
             # PRIORITIZE Barbara O'Neill books (1.epub, 2.epub) over general content
-            book_name = chunk.get("book", "").lower()
-            if any(priority_book in book_name for priority_book in ["1.epub", "2.epub"]):
+            priority = chunk_book_priority[idx]
+            if priority > 0:
                 score += 20  # Significant boost for Barbara O'Neill content
-                print(f"📚 Boosting Barbara O'Neill book: {book_name}")
-            elif "test-book" in book_name:
+                print(f"📚 Boosting Barbara O'Neill book: {books_data[idx].get('book', '').lower()}")
+            elif priority < 0:
                 score = max(0, score - 10)  # Reduce score for test content
-                print(f"📚 Reducing test book score: {book_name}")
+                print(f"📚 Reducing test book score: {books_data[idx].get('book', '').lower()}")
         
         if score > 0:
             results.append({
-                "chunk": chunk,
+                "idx": idx,
                 "score": score
             })
-            print(f"📊 Chunk scored {score}: {chunk['text'][:100]}...")
+            print(f"📊 Chunk scored {score}: {books_data[idx]['text'][:100]}...")
     
-    # Sort by score and return top results
-    results.sort(key=lambda x: x["score"], reverse=True)
+    # Return the top results by score - a heap over the few wanted instead of sorting every scored chunk
+    # (nlargest is stable like the sort it replaces, so equal scores keep corpus order)
     print(f"📈 Found {len(results)} matching chunks, returning top {max_results}")
-    return [r["chunk"] for r in results[:max_results]]
+    return tuple(r["idx"] for r in heapq.nlargest(max_results, results, key=lambda x: x["score"]))
 
+@functools.lru_cache(maxsize=2048)
 def affiliate_search_url(query: str, tag: str = AFFILIATE_TAG) -> str:
     """Generate Amazon affiliate search URL"""
     q = urllib.parse.quote_plus(query)
     # Determine category based on ingredient type
-    category = "grocery"
-    if any(tool in query.lower() for tool in ["mortar", "pestle", "gauze", "bandage", "thermometer"]):
-        category = "hpc"
-    i_param = {"grocery": "grocery", "hpc": "hpc"}.get(category, "grocery")
-    return f"https://www.amazon.com/s?k={q}&i={i_param}&tag={tag}"
+    category = "hpc" if HPC_TOOL_RE.search(query) else "grocery"
+    return f"https://www.amazon.com/s?k={q}&i={category}&tag={tag}"
 
-class handler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        # Ensure books are loaded
-        load_epub_books()
-        
-        if self.path == '/':
-            # Serve the main HTML page
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            
-            html = """
-<!doctype html>
-<html lang="en">
-<head>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1">
-    <title>Traditional Remedy Search - Natural Healing Database</title>
-    <style>
-        @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700;800&family=Playfair+Display:wght@400;500;600;700&display=swap');
-        
-        :root {
-            --forest-primary: #2d5016;
-            --forest-accent: #4a7c59;
-            --forest-light: #7fb069;
-            --forest-glow: #a3d977;
-            --forest-mist: #c8e6c9;
-            --earth-brown: #8d6e63;
-            --healing-gold: #ffd54f;
-            --pure-white: #ffffff;
-            --soft-shadow: rgba(45, 80, 22, 0.1);
-            --deep-shadow: rgba(45, 80, 22, 0.2);
-            --glass-bg: rgba(255, 255, 255, 0.85);
-            --glass-border: rgba(255, 255, 255, 0.3);
-        }
-        
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        
-        body { 
-            font-family: 'Poppins', sans-serif;
-            background: linear-gradient(135deg, #1a4c3d 0%, #2d5016 25%, #4a7c59 75%, #7fb069 100%);
-            background-attachment: fixed;
-            color: var(--forest-primary);
-            line-height: 1.7;
-            min-height: 100vh;
-            position: relative;
-            overflow-x: hidden;
-        }
-        
-        body::before {
-            content: '';
-            position: fixed;
-            top: 0;
-            left: 0;
-            right: 0;
-            bottom: 0;
-            background: 
-                radial-gradient(circle at 20% 20%, rgba(163, 217, 119, 0.3) 0%, transparent 50%),
-                radial-gradient(circle at 80% 80%, rgba(200, 230, 201, 0.3) 0%, transparent 50%),
-                radial-gradient(circle at 40% 60%, rgba(255, 213, 79, 0.2) 0%, transparent 50%);
-            pointer-events: none;
-            z-index: -1;
-        }
-        
-        .floating-leaves {
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            pointer-events: none;
-            z-index: -1;
-        }
-        
-        .leaf {
-            position: absolute;
-            width: 20px;
-            height: 20px;
-            background: var(--forest-light);
-            border-radius: 0 100% 0 100%;
-            opacity: 0.6;
-            animation: float 15s infinite ease-in-out;
-        }
-        
-        .leaf:nth-child(2) { left: 10%; animation-delay: -2s; animation-duration: 12s; }
-        .leaf:nth-child(3) { left: 20%; animation-delay: -4s; animation-duration: 18s; }
-        .leaf:nth-child(4) { left: 30%; animation-delay: -6s; animation-duration: 14s; }
-        .leaf:nth-child(5) { left: 40%; animation-delay: -8s; animation-duration: 16s; }
-        .leaf:nth-child(6) { left: 60%; animation-delay: -10s; animation-duration: 13s; }
-        .leaf:nth-child(7) { left: 70%; animation-delay: -12s; animation-duration: 17s; }
-        .leaf:nth-child(8) { left: 80%; animation-delay: -14s; animation-duration: 15s; }
-        .leaf:nth-child(9) { left: 90%; animation-delay: -16s; animation-duration: 11s; }
-        
-        @keyframes float {
-            0%, 100% { transform: translateY(-100vh) rotate(0deg); opacity: 0; }
-            10%, 90% { opacity: 0.6; }
-            50% { transform: translateY(50vh) rotate(180deg); }
-        }
-        
-        .container {
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 2rem 1rem;
-            position: relative;
-            z-index: 1;
-        }
-        
-        .header {
-            text-align: center;
-            margin-bottom: 4rem;
-            position: relative;
-        }
-        
-        .title {
-            font-family: 'Playfair Display', serif;
-            font-size: 4rem;
-            font-weight: 700;
-            color: var(--pure-white);
-            margin-bottom: 1rem;
-            letter-spacing: -0.02em;
-            text-shadow: 2px 2px 20px var(--deep-shadow);
-            position: relative;
-        }
-        
-        .title-emoji {
-            display: inline-block;
-            font-size: 4.5rem;
-            margin-right: 1rem;
-            filter: drop-shadow(0 0 20px var(--healing-gold));
-            animation: glow 3s ease-in-out infinite alternate;
-        }
-        
-        @keyframes glow {
-            from { filter: drop-shadow(0 0 20px var(--healing-gold)) drop-shadow(0 0 40px var(--forest-glow)); }
-            to { filter: drop-shadow(0 0 30px var(--healing-gold)) drop-shadow(0 0 60px var(--forest-glow)); }
-        }
-        
-        .subtitle {
-            font-size: 1.4rem;
-            color: var(--forest-mist);
-            font-weight: 400;
-            margin-bottom: 2rem;
-            text-shadow: 1px 1px 10px var(--soft-shadow);
-        }
-        
-        .stats {
-            display: inline-flex;
-            align-items: center;
-            gap: 0.5rem;
-            background: var(--glass-bg);
-            backdrop-filter: blur(20px);
-            padding: 1rem 2rem;
-            border-radius: 50px;
-            border: 1px solid var(--glass-border);
-            font-weight: 500;
-            color: var(--forest-primary);
-            box-shadow: 0 8px 32px var(--soft-shadow);
-        }
-        
-        .search-section {
-            background: var(--glass-bg);
-            backdrop-filter: blur(30px);
-            padding: 3rem;
-            border-radius: 25px;
-            box-shadow: 0 20px 60px var(--deep-shadow);
-            border: 1px solid var(--glass-border);
-            margin-bottom: 3rem;
-            position: relative;
-            overflow: hidden;
-        }
-        
-        .search-section::before {
-            content: '';
-            position: absolute;
-            top: -50%;
-            left: -50%;
-            width: 200%;
-            height: 200%;
-            background: radial-gradient(circle, var(--forest-glow) 0%, transparent 70%);
-            opacity: 0.1;
-            animation: shimmer 6s ease-in-out infinite;
-        }
-        
-        @keyframes shimmer {
-            0%, 100% { transform: rotate(0deg); }
-            50% { transform: rotate(180deg); }
-        }
-        
-        .search-input {
-            width: 100%;
-            padding: 1.5rem 2rem;
-            border: 2px solid var(--glass-border);
-            border-radius: 20px;
-            font-size: 1.2rem;
-            transition: all 0.3s ease;
-            background: rgba(255, 255, 255, 0.9);
-            backdrop-filter: blur(10px);
-            color: var(--forest-primary);
-            font-weight: 500;
-            box-shadow: inset 0 2px 10px rgba(0,0,0,0.1);
-        }
-        
-        .search-input:focus {
-            outline: none;
-            border-color: var(--forest-light);
-            background: var(--pure-white);
-            box-shadow: 0 0 0 5px rgba(127, 176, 105, 0.2), inset 0 2px 10px rgba(0,0,0,0.1);
-            transform: translateY(-2px);
-        }
-        
-        .search-btn {
-            width: 100%;
-            padding: 1.5rem 2rem;
-            background: linear-gradient(135deg, var(--forest-accent) 0%, var(--forest-light) 50%, var(--forest-glow) 100%);
-            color: var(--pure-white);
-            border: none;
-            border-radius: 20px;
-            font-size: 1.2rem;
-            font-weight: 600;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            margin-top: 1.5rem;
-            position: relative;
-            overflow: hidden;
-            text-shadow: 0 2px 4px rgba(0,0,0,0.3);
-            box-shadow: 0 10px 30px var(--soft-shadow);
-        }
-        
-        .search-btn::before {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: -100%;
-            width: 100%;
-            height: 100%;
-            background: linear-gradient(90deg, transparent, rgba(255,255,255,0.3), transparent);
-            transition: left 0.5s;
-        }
-        
-        .search-btn:hover::before {
-            left: 100%;
-        }
-        
-        .search-btn:hover {
-            transform: translateY(-3px);
-            box-shadow: 0 15px 40px var(--deep-shadow);
-        }
-        
-        .search-btn:active {
-            transform: translateY(-1px);
-        }
-        
-        .sample-searches {
-            margin-top: 1.5rem;
-            text-align: center;
-        }
-        
-        .sample-label {
-            color: var(--text-secondary);
-            font-weight: 500;
-            margin-bottom: 1rem;
-            display: block;
-        }
-        
-        .sample-tag {
-            display: inline-block;
-            margin: 0.25rem;
-            padding: 0.5rem 1rem;
-            background: var(--secondary);
-            color: var(--text-secondary);
-            border-radius: 100px;
-            cursor: pointer;
-            font-size: 0.875rem;
-            font-weight: 500;
-            transition: all 0.2s ease;
-            border: 1px solid var(--border);
-        }
-        
-        .sample-tag:hover {
-            background: var(--primary);
-            color: white;
-            transform: translateY(-1px);
-        }
-        
-        .remedy-card {
-            background: var(--bg-card);
-            border-radius: 16px;
-            padding: 2rem;
-            margin-bottom: 1.5rem;
-            border: 1px solid var(--border);
-            box-shadow: var(--shadow);
-            transition: all 0.2s ease;
-        }
-        
-        .remedy-card:hover {
-            box-shadow: var(--shadow-lg);
-            transform: translateY(-2px);
-        }
-        
-        .remedy-title {
-            font-size: 1.5rem;
-            font-weight: 600;
-            color: var(--text-primary);
-            margin-bottom: 1rem;
-            border-bottom: 2px solid var(--border);
-            padding-bottom: 1rem;
-        }
-        
-        .remedy-summary {
-            color: var(--text-secondary);
-            font-style: italic;
-            margin-bottom: 1.5rem;
-            font-size: 1.1rem;
-        }
-        
-        .section-title {
-            display: flex;
-            align-items: center;
-            gap: 0.5rem;
-            font-size: 1.1rem;
-            font-weight: 600;
-            color: var(--text-primary);
-            margin: 1.5rem 0 1rem 0;
-        }
-        
-        .ingredients-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 0.75rem;
-            margin-bottom: 1.5rem;
-        }
-        
-        .ingredient-item {
-            display: flex;
-            align-items: center;
-            justify-content: space-between;
-            background: var(--bg-page);
-            padding: 0.75rem 1rem;
-            border-radius: 8px;
-            border: 1px solid var(--border);
-        }
-        
-        .ingredient-name {
-            font-weight: 500;
-            color: var(--text-primary);
-        }
-        
-        .ingredient-link {
-            background: var(--primary);
-            color: white;
-            text-decoration: none;
-            padding: 0.25rem 0.75rem;
-            border-radius: 6px;
-            font-size: 0.75rem;
-            font-weight: 500;
-            transition: all 0.2s ease;
-        }
-        
-        .ingredient-link:hover {
-            background: var(--primary-dark);
-            transform: scale(1.05);
-        }
-        
-        .instructions-list {
-            list-style: none;
-            counter-reset: step-counter;
-        }
-        
-        .instructions-list li {
-            counter-increment: step-counter;
-            margin-bottom: 1rem;
-            padding: 1rem;
-            background: var(--bg-page);
-            border-radius: 8px;
-            border-left: 3px solid var(--primary);
-            position: relative;
-        }
-        
-        .instructions-list li::before {
-            content: counter(step-counter);
-            position: absolute;
-            left: -1.5rem;
-            top: 1rem;
-            background: var(--primary);
-            color: white;
-            border-radius: 50%;
-            width: 2rem;
-            height: 2rem;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-weight: 600;
-            font-size: 0.875rem;
-        }
-        
-        .source-info {
-            background: var(--secondary);
-            padding: 1rem;
-            border-radius: 8px;
-            margin-top: 1.5rem;
-            border-left: 3px solid var(--primary);
-        }
-        
-        .source-text {
-            font-size: 0.875rem;
-            color: var(--text-secondary);
-            font-weight: 500;
-        }
-        
-        .loading {
-            text-align: center;
-            padding: 4rem;
-            background: var(--glass-bg);
-            backdrop-filter: blur(30px);
-            border-radius: 25px;
-            border: 1px solid var(--glass-border);
-            box-shadow: 0 20px 60px var(--deep-shadow);
-            position: relative;
-            overflow: hidden;
-        }
-        
-        .loading::before {
-            content: '';
-            position: absolute;
-            top: -50%;
-            left: -50%;
-            width: 200%;
-            height: 200%;
-            background: radial-gradient(circle, var(--healing-gold) 0%, transparent 70%);
-            opacity: 0.1;
-            animation: shimmer 4s ease-in-out infinite;
-        }
-        
-        .spinner {
-            width: 3rem;
-            height: 3rem;
-            border: 4px solid rgba(127, 176, 105, 0.3);
-            border-top: 4px solid var(--forest-light);
-            border-radius: 50%;
-            animation: spin 1.5s linear infinite;
-            margin: 0 auto 2rem;
-            position: relative;
-            z-index: 1;
-        }
-        
-        .spinner::after {
-            content: '';
-            position: absolute;
-            top: 50%;
-            left: 50%;
-            width: 1rem;
-            height: 1rem;
-            background: var(--healing-gold);
-            border-radius: 50%;
-            transform: translate(-50%, -50%);
-            animation: pulse 2s ease-in-out infinite;
-        }
-        
-        @keyframes spin { to { transform: rotate(360deg); } }
-        @keyframes pulse { 
-            0%, 100% { transform: translate(-50%, -50%) scale(1); opacity: 1; }
-            50% { transform: translate(-50%, -50%) scale(1.5); opacity: 0.7; }
-        }
-        
-        .loading-text {
-            color: var(--forest-primary);
-            font-weight: 600;
-            margin-bottom: 1rem;
-            font-size: 1.2rem;
-            position: relative;
-            z-index: 1;
-        }
-        
-        .loading-subtext {
-            color: var(--forest-accent);
-            font-size: 1rem;
-            position: relative;
-            z-index: 1;
-        }
-        
-        .disclaimer {
-            background: linear-gradient(135deg, #fef3c7, #fde68a);
-            border: 1px solid #f59e0b;
-            border-radius: 12px;
-            padding: 1.5rem;
-            margin-top: 3rem;
-        }
-        
-        .disclaimer-title {
-            font-weight: 600;
-            color: #92400e;
-            margin-bottom: 0.5rem;
-        }
-        
-        .disclaimer-text {
-            font-size: 0.875rem;
-            color: #92400e;
-            line-height: 1.5;
-        }
+def remedy_id_for(text: str, title: str) -> str:
+    """Short content hash of a chunk's opening text plus its remedy title"""
+    h = hashlib.blake2b(digest_size=6)
+    h.update(text[:200].encode())
+    h.update(title.encode())
+    return h.hexdigest()
+
+def is_relevant_chunk(chunk: Dict, original_query: str) -> bool:
+    """Whether a matching chunk is about the query, rather than children's health or generic detox content mentioning it"""
+    text_lower = chunk["text_lower"]  # Lowercased once at load by index_books_data()
+    
+    # Check if this chunk is actually relevant to the query
+    query_relevance = 0
+    if original_query in text_lower:
+        # Check how many times query appears and in what context
+        query_count = text_lower.count(original_query)
+        # Check if it's surrounded by remedy context
+        sentences_with_query = [s for s in text_lower.split('.') if original_query in s]
+        remedy_context_count = sum(1 for s in sentences_with_query 
+                                 if any(kw in s for kw in RANK_REMEDY_KEYWORDS))
+        query_relevance = query_count + remedy_context_count * 2
+    
+    # Skip chunks that are clearly not relevant to the specific query
+    if chunk["has_pediatric_kw"] and query_relevance < 2:
+        print(f"❌ Skipping irrelevant chunk (children/pediatric content): {chunk['text'][:100]}...")
+        return False
+    
+    # Skip generic detox/cleansing content unless specifically relevant
+    if chunk["has_generic_kw"] and query_relevance < 3:
+        print(f"❌ Skipping generic content: {chunk['text'][:100]}...")
+        return False
+    
+    return True
+
+def find_remedies(query: str, max_results: int) -> List[Dict]:
+    """Build remedy cards (ingredients with affiliate links, instructions, source) for a search query"""
+    # Find relevant chunks
+    matching_chunks = simple_text_search(query, max_results * 2)
+    print(f"Found {len(matching_chunks)} matching chunks")
+    
+    # Extract remedies from matching chunks - be more lenient
+    remedies = []
+    used_remedy_ids = set()  # Track unique remedies to prevent duplicates
+    used_titles = set()  # Track titles to prevent similar content
+    
+    # Make query available for processing
+    original_query = query.lower().strip()
+    relevant_chunks = []
+    for i, chunk in enumerate(matching_chunks):
+        print(f"Processing chunk {i}: {chunk['text'][:100]}...")
+        if is_relevant_chunk(chunk, original_query):
+            relevant_chunks.append((i, chunk))
+    
+    # Extraction is mostly OpenAI round trips, so upcoming remedy chunks are extracted concurrently - but never more
+    # at once than the remedies still needed, since the loop stops at max_results and each extraction is paid for
+    remedy_chunks = deque((i, chunk) for i, chunk in relevant_chunks if chunk["has_ingredient"] and chunk["has_remedy_kw"])
+    in_flight = {}  # chunk position -> Future of its extraction, in ranking order
+    
+    for i, chunk in relevant_chunks:
+        is_remedy_chunk = chunk["has_ingredient"] and chunk["has_remedy_kw"]
         
-        .empty-state {
-            text-align: center;
-            padding: 3rem;
-            color: var(--text-secondary);
-        }
+        # Extraction (and its AI calls) only feeds the two branches below - skip chunks neither can use
+        if not is_remedy_chunk and (remedies or i >= 3):
+            continue
         
-        .status.error {
-            background: #fef2f2;
-            color: #dc2626;
-            border: 1px solid #fecaca;
-            border-radius: 8px;
-            padding: 1rem;
-        }
+        if is_remedy_chunk:
+            # Top up from this chunk onwards - results so far decide how many more remedies are needed
+            while remedy_chunks and len(in_flight) < max(max_results - len(remedies), 1):
+                j, upcoming = remedy_chunks.popleft()
+                in_flight[j] = EXTRACT_EXECUTOR.submit(extract_ingredients_and_steps, upcoming["text"])
         
-        @media (max-width: 768px) {
-            .title { font-size: 2rem; }
-            .container { padding: 1rem; }
-            .search-section { padding: 1.5rem; }
-            .remedy-card { padding: 1.5rem; }
-            .ingredients-grid { grid-template-columns: 1fr; }
-        }
-    </style>
-</head>
-<body>
-    <div class="floating-leaves">
-        <div class="leaf"></div>
-        <div class="leaf"></div>
-        <div class="leaf"></div>
-        <div class="leaf"></div>
-        <div class="leaf"></div>
-        <div class="leaf"></div>
-        <div class="leaf"></div>
-        <div class="leaf"></div>
-        <div class="leaf"></div>
-    </div>
-    
-    <div class="container">
-        <div class="header">
-            <h1 class="title"><span class="title-emoji">🌿</span> Natural Healing Sanctuary</h1>
-            <p class="subtitle">Ancient Wisdom from Barbara O'Neill's Sacred Remedy Collection</p>
+        if i in in_flight:
+            extracted = in_flight.pop(i).result()
+        else:
+            extracted = extract_ingredients_and_steps(chunk["text"])
+        
+        # If we found a proper remedy, use it
+        if is_remedy_chunk and extracted["ingredients"]:
+            # Title from the first sentence, id from content + title - both computed at load unless the chunk has no first sentence
+            if chunk["remedy_title"]:
+                title = chunk["remedy_title"]
+                remedy_id = chunk["remedy_id"]
+            else:
+                title = f"Remedy for {query}"
+                remedy_id = remedy_id_for(chunk["text"], title)  # Use content + title for uniqueness
             
-            <div class="stats" id="stats">
-                📚 Loading sacred remedy database...
-            </div>
-        </div>
-        
-        <div class="search-section">
-            <input type="text" class="search-input" id="query" placeholder="Search for conditions like liver cancer, stomach pain, inflammation...">
-            <button class="search-btn" id="search-btn">🔍 Find Natural Remedies</button>
+            # Check for duplicate remedies by ID and title similarity
+            title_key = title.lower().replace(" ", "").replace("-", "").replace(":", "")[:50]
             
-            <div class="sample-searches">
-                <span class="sample-label">Popular searches:</span>
-                <span class="sample-tag" onclick="searchFor('liver cancer')">Liver Cancer</span>
-                <span class="sample-tag" onclick="searchFor('stomach cancer')">Stomach Cancer</span>
-                <span class="sample-tag" onclick="searchFor('inflammation')">Inflammation</span>
-                <span class="sample-tag" onclick="searchFor('headache')">Headache</span>
-                <span class="sample-tag" onclick="searchFor('arthritis')">Arthritis</span>
-                <span class="sample-tag" onclick="searchFor('diabetes')">Diabetes</span>
-            </div>
-        </div>
-        
-        <div id="results"></div>
-        
-        <div class="disclaimer">
-            <div class="disclaimer-title">⚠️ Important Medical Disclaimer</div>
-            <div class="disclaimer-text">
-                This information is for educational purposes only and is not intended as medical advice. 
-                Always consult qualified healthcare professionals before using any natural remedies. 
-                Do not replace conventional medical treatment with these suggestions. 
-                As an Amazon Associate, we may earn from qualifying purchases through our links.
-            </div>
-        </div>
-    </div>
-
-    <script>
-        // Wait for DOM to be fully loaded
-        document.addEventListener('DOMContentLoaded', function() {
-            console.log('🌿 Forest Sanctuary Script Loading...');
+            if remedy_id in used_remedy_ids or title_key in used_titles:
+                print(f"Skipping duplicate remedy: {remedy_id} - {title[:50]}...")
+                continue
             
-            const query = document.getElementById('query');
-            const searchBtn = document.getElementById('search-btn');
-            const results = document.getElementById('results');
-            const stats = document.getElementById('stats');
-
-            console.log('🔍 Elements found:', {
-                query: !!query,
-                searchBtn: !!searchBtn,
-                results: !!results,
-                stats: !!stats
-            });
-
-            // Load stats on page load
-            loadStats();
-
-            async function loadStats() {
-                try {
-                    const response = await fetch('/api/health');
-                    const data = await response.json();
-                    if (stats) {
-                        stats.innerHTML = `📚 Sacred database contains <strong>${data.chunks_loaded}</strong> healing remedies`;
-                    }
-                } catch (error) {
-                    if (stats) {
-                        stats.innerHTML = '📚 Sacred remedy database loaded and ready';
-                    }
-                }
-            }
-
-            function searchFor(term) {
-                if (query) {
-                    query.value = term;
-                    performSearch();
-                }
-            }
-
-            async function performSearch() {
-                console.log('🔍 performSearch called with query:', query?.value);
-                
-                if (!query || !query.value.trim()) {
-                    console.log('❌ No query provided');
-                    return;
+            used_remedy_ids.add(remedy_id)
+            used_titles.add(title_key)
+            print(f"✅ Adding unique remedy: {remedy_id} - {title[:50]}...")
+            
+            # Add affiliate links to ingredients - the dicts were built by this chunk's extraction alone, so link them in place
+            ingredients_with_links = extracted["ingredients"]
+            for ingredient in ingredients_with_links:
+                ingredient["link"] = affiliate_search_url(ingredient["name"])
+            
+            remedies.append({
+                "id": remedy_id,
+                "title": title,
+                "summary": None,
+                "ingredients": ingredients_with_links,
+                "instructions": extracted["instructions"],
+                "source": {
+                    "book": chunk.get("book", "Traditional Text"),
+                    "chapter": chunk.get("chapter", "Unknown Chapter"), 
+                    "pos": chunk.get("pos", 0)
                 }
+            })
+            print(f"Added remedy: {title}")
+            
+        # If no strict remedies found, create a simple remedy from any matching chunk
+        elif len(remedies) == 0 and i < 3:  # Only for first few chunks if no proper remedies
+            # Create a basic remedy from the chunk
+            title = f"Traditional approach for {query}"
+            # Create unique ID for basic remedies too
+            remedy_id = remedy_id_for(chunk["text"], title)
+            title_key = title.lower().replace(" ", "").replace("-", "").replace(":", "")[:50]
+            
+            # Check for duplicate remedies by ID and title similarity
+            if remedy_id in used_remedy_ids or title_key in used_titles:
+                print(f"Skipping duplicate basic remedy: {remedy_id} - {title[:50]}...")
+                continue
+            
+            used_remedy_ids.add(remedy_id)
+            used_titles.add(title_key)
+            print(f"✅ Adding unique basic remedy: {remedy_id} - {title[:50]}...")
+            
+            # Extract any ingredients we can find
+            basic_ingredients = []
+            if extracted["ingredients"]:
+                basic_ingredients = extracted["ingredients"]
+            else:
+                # Try to find ingredient-like words from common herbs
+                text_lower = chunk["text_lower"]
+                common_ingredients = ["ginger", "honey", "lemon", "water", "oil", "tea", "garlic", "turmeric", 
+                                   "cinnamon", "pepper", "salt", "vinegar", "chamomile", "mint", "basil"]
                 
-                if (!results) {
-                    console.log('❌ Results element not found');
-                    return;
+                found_ingredients = set()
+                for ingredient in common_ingredients:
+                    if ingredient in text_lower and ingredient not in found_ingredients:
+                        found_ingredients.add(ingredient)
+                        basic_ingredients.append({
+                            "name": ingredient.title(),
+                            "amount": None,
+                            "unit": None,
+                            "raw": ingredient,
+                            "link": affiliate_search_url(ingredient)
+                        })
+                        if len(basic_ingredients) >= 5:  # Limit to 5 basic ingredients
+                            break
+            
+            remedies.append({
+                "id": remedy_id,
+                "title": title,
+                "summary": chunk["text"][:200] + "..." if len(chunk["text"]) > 200 else chunk["text"],
+                "ingredients": basic_ingredients,
+                "instructions": extracted["instructions"] or ["Refer to traditional preparation methods"],
+                "source": {
+                    "book": chunk.get("book", "Traditional Text"),
+                    "chapter": chunk.get("chapter", "General"), 
+                    "pos": chunk.get("pos", 0)
                 }
+            })
+            print(f"Added basic remedy: {title}")
                 
-                // Show modern forest-themed loading indicator
-                results.innerHTML = `
-                    <div class="loading">
-                        <div class="spinner"></div>
-                        <div class="loading-text">🌿 Searching Sacred Remedy Forest...</div>
-                        <div class="loading-subtext">Discovering ancient healing wisdom from Barbara O'Neill's collection</div>
-                    </div>
-                `;
-                
-                try {
-                    console.log('🌿 Making API request...');
-                    const response = await fetch('/api/search', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({ q: query.value, k: 5 })
-                    });
-                    
-                    console.log('📡 Response received:', response.status);
-                    const data = await response.json();
-                    console.log('📊 Data:', data);
-                    
-                    if (!data.ok) {
-                        results.innerHTML = `<div class="status error">❌ Search error: ${data.error}</div>`;
-                        return;
-                    }
-                    
-                    if (data.remedies.length === 0) {
-                        results.innerHTML = '<div class="empty-state">No sacred remedies found for this search. Try searching for "liver cancer", "inflammation", or "headache".</div>';
-                        return;
-                    }
-                    
-                    console.log('✅ Found', data.remedies.length, 'remedies');
-                    results.innerHTML = data.remedies.map(remedy => `
-                        <div class="remedy-card">
-                            <h2 class="remedy-title">${remedy.title}</h2>
-                            ${remedy.summary ? `<p class="remedy-summary">${remedy.summary}</p>` : ''}
-                            
-                            ${remedy.ingredients.length > 0 ? `
-                                <div class="section-title">🧪 Sacred Ingredients</div>
-                                <div class="ingredients-grid">
-                                    ${remedy.ingredients.map(ing => `
-                                        <div class="ingredient-item">
-                                            <span class="ingredient-name">${[ing.amount, ing.unit, ing.name].filter(Boolean).join(' ')}</span>
-                                            <a href="${ing.link}" target="_blank" rel="nofollow sponsored noopener" class="ingredient-link">🛒 Find</a>
-                                        </div>
-                                    `).join('')}
-                                </div>
-                            ` : ''}
-                            
-                            ${remedy.instructions && remedy.instructions.length > 0 ? `
-                                <div class="section-title">📋 Sacred Preparation</div>
-                                <ol class="instructions-list">
-                                    ${remedy.instructions.map(step => `<li>${step}</li>`).join('')}
-                                </ol>
-                            ` : ''}
-                            
-                            <div class="source-info">
-                                <div class="source-text">📖 Source: ${remedy.source?.book || 'Barbara O\'Neill Sacred Collection'} - ${remedy.source?.chapter || 'Chapter'} (Section ${remedy.source?.pos || '?'})</div>
-                            </div>
-                        </div>
-                    `).join('');
-                    
-                } catch (error) {
-                    console.error('🚨 Search error:', error);
-                    results.innerHTML = `<div class="status error">❌ Sacred forest search failed: ${error.message}</div>`;
-                }
-            }
+        if len(remedies) >= max_results:
+            break
+    
+    # Extractions nobody will read - drop those that haven't started (running ones can't be interrupted)
+    for future in in_flight.values():
+        future.cancel()
+    
+    print(f"Total remedies found: {len(remedies)}")
+    return remedies
 
-            // Add event listeners with robust error handling
-            if (searchBtn) {
-                searchBtn.addEventListener('click', (e) => {
-                    console.log('🔍 Search button clicked!');
-                    e.preventDefault();
-                    e.stopPropagation();
-                    performSearch();
-                });
-                console.log('✅ Search button listener attached');
-            } else {
-                console.error('❌ Search button not found!');
-            }
-            
-            if (query) {
-                query.addEventListener('keypress', (e) => {
-                    if (e.key === 'Enter') {
-                        console.log('⌨️ Enter key pressed!');
-                        e.preventDefault();
-                        performSearch();
-                    }
-                });
-                console.log('✅ Query input listener attached');
-            } else {
-                console.error('❌ Query input not found!');
-            }
-            
-            // Make searchFor globally available
-            window.searchFor = searchFor;
+def search_response_body(query: str, max_results: int, version: int) -> bytes:
+    """Serialized /api/search response, cached per query for SEARCH_CACHE_TTL seconds;
+    `version` is books_version so reloads never serve stale remedies"""
+    key = (query, max_results, version)
+    now = time.monotonic()
+    with search_cache_lock:
+        cached = search_cache.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+    
+    body = dumps_json({"ok": True, "remedies": find_remedies(query, max_results)})
+    
+    with search_cache_lock:
+        search_cache.pop(key, None)  # Re-insert so dict order stays oldest-first
+        search_cache[key] = (now + SEARCH_CACHE_TTL, body)
+        while len(search_cache) > SEARCH_CACHE_SIZE:
+            del search_cache[next(iter(search_cache))]
+    return body
+
+@functools.lru_cache(maxsize=8)
+def health_response_body(version: int, current_files: Tuple[str, ...]) -> bytes:
+    """Serialized /api/health response - only changes when books are reloaded or the deployed files change"""
+    epub_files = [f for f in current_files if f.endswith('.epub')]
+    response = {
+        "status": "healthy", 
+        "chunks_loaded": len(books_data),
+        "books": len(loaded_book_names),
+        "debug": {
+            "total_files": len(current_files),
+            "epub_files": epub_files,
+            "sample_files": list(current_files[:10])  # First 10 files
+        }
+    }
+    return dumps_json(response)
+
+# JSON bodies at least this large are gzipped for clients that accept it - below it the gzip header isn't worth it
+GZIP_MIN_SIZE = 500
+
+@functools.lru_cache(maxsize=256)
+def gzip_json_body(body: bytes) -> bytes:
+    """gzip-compressed JSON response body - cached, since search and health bodies are themselves cached and resent"""
+    return gzip.compress(body, 6)
+
+def dumps_json(obj: Any, indent: bool = False) -> bytes:
+    """Encode an API response as UTF-8 JSON bytes, using orjson if installed (`indent` pretty-prints with 2 spaces)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    return json.dumps(obj, indent=2 if indent else None).encode()
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/':
+            # Serve the main HTML page - 304 if the browser already has it, gzipped if it accepts that
+            if self.headers.get('If-None-Match') == HOME_PAGE_ETAG:
+                self.send_response(304)
+                self.send_header('ETag', HOME_PAGE_ETAG)
+                self.end_headers()
+                return
             
-            console.log('🌿 Forest Sanctuary fully initialized!');
-        });
-    </script>
-</body>
-</html>
-            """
+            use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+            body = HOME_PAGE_GZIP if use_gzip else HOME_PAGE_BYTES
+            self.send_response(200)
+            self.send_header('Content-type', 'text/html')
+            self.send_header('ETag', HOME_PAGE_ETAG)
+            self.send_header('Cache-Control', 'public, max-age=3600')
+            self.send_header('Vary', 'Accept-Encoding')
+            if use_gzip:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
             
-            self.wfile.write(html.encode())
+            self.wfile.write(body)
             
         elif self.path == '/api/debug':
             # Debug endpoint to test EPUB processing
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            
             debug_info = {
                 "epub_libraries": False,
                 "epub_files_found": [],
@@ -1451,9 +1173,8 @@ class handler(BaseHTTPRequestHandler):
             }
             
             try:
-                import ebooklib
-                from ebooklib import epub
-                from bs4 import BeautifulSoup
+                if EPUB_IMPORT_ERROR is not None:
+                    raise ImportError(EPUB_IMPORT_ERROR)
                 debug_info["epub_libraries"] = True
                 debug_info["processing_log"].append("EPUB libraries imported successfully")
                 
@@ -1465,15 +1186,13 @@ class handler(BaseHTTPRequestHandler):
                         debug_info["processing_log"].append(f"1.epub: Found {len(items)} items")
                         
                         doc_count = 0
-                        for item in items:
-                            if item.get_type() == ebooklib.ITEM_DOCUMENT:
-                                doc_count += 1
-                                if doc_count <= 3:  # Only process first 3 documents
-                                    content = item.get_content()
-                                    if content:
-                                        soup = BeautifulSoup(content, "html.parser")
-                                        text = soup.get_text(" ", strip=True)[:200]
-                                        debug_info["processing_log"].append(f"Document {doc_count}: {text}...")
+                        for item in book.get_items_of_type(ebooklib.ITEM_DOCUMENT):
+                            doc_count += 1
+                            if doc_count <= 3:  # Only process first 3 documents
+                                content = item.get_content()
+                                if content:
+                                    text = html_to_text(content)[:200]
+                                    debug_info["processing_log"].append(f"Document {doc_count}: {text}...")
                         
                         debug_info["processing_log"].append(f"Total documents in 1.epub: {doc_count}")
                         
@@ -1485,55 +1204,32 @@ class handler(BaseHTTPRequestHandler):
             except Exception as e:
                 debug_info["processing_log"].append(f"Other error: {str(e)}")
             
-            self.wfile.write(json.dumps(debug_info, indent=2).encode())
+            self.send_json(200, dumps_json(debug_info, indent=True))
             
         elif self.path == '/api/health':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
+            ensure_books_loaded()
             
             # Get current directory files for debugging
             try:
-                current_files = os.listdir('.')
-                epub_files = [f for f in current_files if f.endswith('.epub')]
+                current_files = tuple(os.listdir('.'))
             except:
-                current_files = []
-                epub_files = []
+                current_files = ()
             
-            response = {
-                "status": "healthy", 
-                "chunks_loaded": len(books_data),
-                "books": len(set(chunk.get("book", "unknown") for chunk in books_data)),
-                "debug": {
-                    "total_files": len(current_files),
-                    "epub_files": epub_files,
-                    "sample_files": current_files[:10]  # First 10 files
-                }
-            }
-            self.wfile.write(json.dumps(response).encode())
+            self.send_json(200, health_response_body(books_version, current_files))
             
         else:
-            self.send_response(404)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            response = {"detail": "Not Found"}
-            self.wfile.write(json.dumps(response).encode())
+            self.send_json(404, dumps_json({"detail": "Not Found"}))
 
     def do_POST(self):
         if self.path == '/api/search':
             self.handle_search()
         else:
-            self.send_response(404)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            response = {"detail": "Not Found"}
-            self.wfile.write(json.dumps(response).encode())
+            self.send_json(404, dumps_json({"detail": "Not Found"}))
 
     def handle_search(self):
         """Handle remedy search"""
         print("🔍 SEARCH REQUEST RECEIVED!")
-        load_epub_books()  # Ensure books are loaded
+        ensure_books_loaded()
         
         try:
             content_length = int(self.headers['Content-Length'])
@@ -1551,180 +1247,39 @@ class handler(BaseHTTPRequestHandler):
                 self.send_error_response("No remedy data loaded.")
                 return
             
-            # Find relevant chunks
-            matching_chunks = simple_text_search(query, max_results * 2)
-            print(f"Found {len(matching_chunks)} matching chunks")
-            
-            # Extract remedies from matching chunks - be more lenient
-            remedies = []
-            used_remedy_ids = set()  # Track unique remedies to prevent duplicates
-            used_titles = set()  # Track titles to prevent similar content
-            
-            # Define remedy keywords for relevance checking
-            remedy_keywords = ["remedy", "treatment", "cure", "heal", "recipe", "medicine", "therapeutic", 
-                              "natural", "herbal", "traditional", "preparation", "formula", "mixture"]
-            
-            # Make query available for processing
-            original_query = query.lower().strip()
-            for i, chunk in enumerate(matching_chunks):
-                print(f"Processing chunk {i}: {chunk['text'][:100]}...")
-                
-                # First, try strict search for proper remedies
-                text_lower = chunk["text"].lower()
-                
-                # Check if this chunk is actually relevant to the query
-                query_relevance = 0
-                if original_query in text_lower:
-                    # Check how many times query appears and in what context
-                    query_count = text_lower.count(original_query)
-                    # Check if it's surrounded by remedy context
-                    sentences_with_query = [s for s in text_lower.split('.') if original_query in s]
-                    remedy_context_count = sum(1 for s in sentences_with_query 
-                                             if any(kw in s for kw in remedy_keywords))
-                    query_relevance = query_count + remedy_context_count * 2
-                
-                # Skip chunks that are clearly not relevant to the specific query
-                irrelevant_keywords = ["children", "kids", "baby", "infant", "toddler", "pediatric"]
-                if any(ikw in text_lower for ikw in irrelevant_keywords) and query_relevance < 2:
-                    print(f"❌ Skipping irrelevant chunk (children/pediatric content): {chunk['text'][:100]}...")
-                    continue
-                
-                # Skip generic detox/cleansing content unless specifically relevant
-                generic_keywords = ["detox", "cleansing", "general health", "overall wellness"]
-                if any(gkw in text_lower for gkw in generic_keywords) and query_relevance < 3:
-                    print(f"❌ Skipping generic content: {chunk['text'][:100]}...")
-                    continue
-                
-                is_remedy_chunk = (any(k in text_lower for k in ["ingredient", "ingredients"]) and 
-                                 any(k in text_lower for k in ["remedy", "treatment", "recipe", "for ", "cure", "heal"]))
-                
-                extracted = extract_ingredients_and_steps(chunk["text"])
-                
-                # If we found a proper remedy, use it
-                if is_remedy_chunk and extracted["ingredients"]:
-                    # Extract title from first sentence
-                    first_sentence = chunk["text"].split(".")[0].strip()
-                    if len(first_sentence) > 100:
-                        first_sentence = first_sentence[:100] + "..."
-                    
-                    title = first_sentence if first_sentence else f"Remedy for {query}"
-                    
-                    # Create more unique remedy ID using content hash
-                    content_snippet = chunk["text"][:200] + title  # Use content + title for uniqueness
-                    remedy_id = hashlib.md5(content_snippet.encode()).hexdigest()[:12]
-                    
-                    # Check for duplicate remedies by ID and title similarity
-                    title_key = title.lower().replace(" ", "").replace("-", "").replace(":", "")[:50]
-                    
-                    if remedy_id in used_remedy_ids or title_key in used_titles:
-                        print(f"Skipping duplicate remedy: {remedy_id} - {title[:50]}...")
-                        continue
-                    
-                    used_remedy_ids.add(remedy_id)
-                    used_titles.add(title_key)
-                    print(f"✅ Adding unique remedy: {remedy_id} - {title[:50]}...")
-                    
-                    # Add affiliate links to ingredients
-                    ingredients_with_links = []
-                    for ingredient in extracted["ingredients"]:
-                        ing_copy = ingredient.copy()
-                        ing_copy["link"] = affiliate_search_url(ingredient["name"])
-                        ingredients_with_links.append(ing_copy)
-                    
-                    remedies.append({
-                        "id": remedy_id,
-                        "title": title,
-                        "summary": None,
-                        "ingredients": ingredients_with_links,
-                        "instructions": extracted["instructions"],
-                        "source": {
-                            "book": chunk.get("book", "Traditional Text"),
-                            "chapter": chunk.get("chapter", "Unknown Chapter"), 
-                            "pos": chunk.get("pos", 0)
-                        }
-                    })
-                    print(f"Added remedy: {title}")
-                    
-                # If no strict remedies found, create a simple remedy from any matching chunk
-                elif len(remedies) == 0 and i < 3:  # Only for first few chunks if no proper remedies
-                    # Create a basic remedy from the chunk
-                    title = f"Traditional approach for {query}"
-                    # Create unique ID for basic remedies too
-                    content_snippet = chunk["text"][:200] + title
-                    remedy_id = hashlib.md5(content_snippet.encode()).hexdigest()[:12]
-                    title_key = title.lower().replace(" ", "").replace("-", "").replace(":", "")[:50]
-                    
-                    # Check for duplicate remedies by ID and title similarity
-                    if remedy_id in used_remedy_ids or title_key in used_titles:
-                        print(f"Skipping duplicate basic remedy: {remedy_id} - {title[:50]}...")
-                        continue
-                    
-                    used_remedy_ids.add(remedy_id)
-                    used_titles.add(title_key)
-                    print(f"✅ Adding unique basic remedy: {remedy_id} - {title[:50]}...")
-                    
-                    # Extract any ingredients we can find
-                    basic_ingredients = []
-                    if extracted["ingredients"]:
-                        basic_ingredients = extracted["ingredients"]
-                    else:
-                        # Try to find ingredient-like words from common herbs
-                        text_lower = chunk["text"].lower()
-                        common_ingredients = ["ginger", "honey", "lemon", "water", "oil", "tea", "garlic", "turmeric", 
-                                           "cinnamon", "pepper", "salt", "vinegar", "chamomile", "mint", "basil"]
-                        
-                        found_ingredients = set()
-                        for ingredient in common_ingredients:
-                            if ingredient in text_lower and ingredient not in found_ingredients:
-                                found_ingredients.add(ingredient)
-                                basic_ingredients.append({
-                                    "name": ingredient.title(),
-                                    "amount": None,
-                                    "unit": None,
-                                    "raw": ingredient,
-                                    "link": affiliate_search_url(ingredient)
-                                })
-                                if len(basic_ingredients) >= 5:  # Limit to 5 basic ingredients
-                                    break
-                    
-                    remedies.append({
-                        "id": remedy_id,
-                        "title": title,
-                        "summary": chunk["text"][:200] + "..." if len(chunk["text"]) > 200 else chunk["text"],
-                        "ingredients": basic_ingredients,
-                        "instructions": extracted["instructions"] or ["Refer to traditional preparation methods"],
-                        "source": {
-                            "book": chunk.get("book", "Traditional Text"),
-                            "chapter": chunk.get("chapter", "General"), 
-                            "pos": chunk.get("pos", 0)
-                        }
-                    })
-                    print(f"Added basic remedy: {title}")
-                        
-                if len(remedies) >= max_results:
-                    break
-            
-            print(f"Total remedies found: {len(remedies)}")
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            
-            response = {"ok": True, "remedies": remedies}
-            self.wfile.write(json.dumps(response).encode())
+            self.send_json(200, search_response_body(query, max_results, books_version))
             
         except Exception as e:
             self.send_error_response(f"Search error: {str(e)}")
 
     def send_error_response(self, message):
         """Send error response"""
-        self.send_response(400)
+        response = {"ok": False, "error": message}
+        self.send_json(400, dumps_json(response))
+
+    def send_json(self, status: int, body: bytes):
+        """Send an already-serialized JSON body with its length, in a single write - gzipped if large and accepted"""
+        compressible = len(body) >= GZIP_MIN_SIZE
+        use_gzip = compressible and 'gzip' in self.headers.get('Accept-Encoding', '')
+        if use_gzip:
+            body = gzip_json_body(body)
+        self.send_response(status)
         self.send_header('Content-type', 'application/json')
         self.send_header('Access-Control-Allow-Origin', '*')
+        if compressible:
+            self.send_header('Vary', 'Accept-Encoding')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
         self.end_headers()
-        response = {"ok": False, "error": message}
-        self.wfile.write(json.dumps(response).encode())
+        self.wfile.write(body)
+
+# Load books on module import, in the background so the home page is served without waiting on EPUB parsing
+threading.Thread(target=load_books_in_background, name="load-books", daemon=True).start()
 
-# Load books on module import
-load_epub_books()
\ No newline at end of file
+if __name__ == "__main__":
+    # Local server: one thread per connection, so a slow search (AI calls) doesn't block other requests
+    port = int(os.environ.get("PORT", "8000"))
+    server = ThreadingHTTPServer(("0.0.0.0", port), handler)
+    print(f"Serving on http://localhost:{port}")
+    server.serve_forever()